@@ -2,51 +2,84 @@
 Client TCP sécurisé avec détection MITM
 """
 
-import socket
-import time
+import asyncio
 from typing import Optional
 from message import Message
 from detector import MITMDetector
+from utils import encode_frame, read_msg
 
 
 class SecureClient:
     """Client TCP avec détection MITM"""
     
-    def __init__(self, host: str = 'localhost', port: int = 5555, num_messages: int = 5):
+    def __init__(self, host: str = 'localhost', port: int = 5555, num_messages: int = 5,
+                 send_interval: float = 0.0, max_in_flight: int = 32):
         self.host = host
         self.port = port
         self.num_messages = num_messages
+        self.send_interval = send_interval  # Pause entre deux messages (secondes)
+        self.max_in_flight = max_in_flight  # Messages envoyés sans réponse au maximum
         self.detector: Optional[MITMDetector] = None
     
     def connect_and_communicate(self):
         """Se connecte au serveur et envoie des messages"""
         try:
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client_socket.connect((self.host, self.port))
-            
-            print(f"\n[CLIENT] Connecté à {self.host}:{self.port}\n")
+            asyncio.run(self.communicate())
+        except Exception as e:
+            print(f"[CLIENT] Erreur: {e}")
+    
+    async def communicate(self):
+        """
+        Envoie les messages et analyse les réponses en parallèle
+        
+        L'envoi n'attend pas la réponse précédente : l'analyse d'une réponse
+        se fait pendant que les messages suivants sont en transit.
+        """
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        
+        print(f"\n[CLIENT] Connecté à {self.host}:{self.port}\n")
+        
+        # Numérotation des messages envoyés, indépendante de la séquence attendue en réception
+        sender = MITMDetector(f"CLIENT-{self.host}:{self.port}-ENVOI", quiet=True)
+        self.detector = MITMDetector(f"CLIENT-{self.host}:{self.port}")
+        in_flight: asyncio.Queue = asyncio.Queue(maxsize=self.max_in_flight)
+        
+        try:
+            await asyncio.gather(
+                self._sender(writer, sender, in_flight),
+                self._receiver(reader, in_flight)
+            )
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        
+        self.detector.print_report()
+    
+    async def _sender(self, writer: asyncio.StreamWriter, sender: MITMDetector,
+                      in_flight: asyncio.Queue):
+        """Envoie les messages, bloqué quand max_in_flight réponses sont en attente"""
+        for i in range(self.num_messages):
+            msg = sender.create_message(f"Message {i+1} du client")
+            await in_flight.put(msg.sequence_num)
+            writer.write(encode_frame(msg.to_bytes()))
+            await writer.drain()
+            print(f"[CLIENT] Message envoyé: #{msg.sequence_num} - {msg.content}")
             
-            self.detector = MITMDetector(f"CLIENT-{self.host}:{self.port}")
+            if self.send_interval:
+                await asyncio.sleep(self.send_interval)
+    
+    async def _receiver(self, reader: asyncio.StreamReader, in_flight: asyncio.Queue):
+        """Reçoit une réponse par message envoyé et l'analyse"""
+        for _ in range(self.num_messages):
+            # Recevoir la réponse (trame préfixée par sa longueur)
+            response_data = await read_msg(reader)
+            if response_data is None:
+                raise ConnectionError("Connexion fermée par le serveur")
             
-            # Envoyer des messages
-            for i in range(self.num_messages):
-                msg = self.detector.create_message(f"Message {i+1} du client")
-                client_socket.send(msg.to_json().encode())
-                print(f"[CLIENT] Message envoyé: #{msg.sequence_num} - {msg.content}")
-                
-                # Recevoir la réponse
-                response_data = client_socket.recv(1024).decode()
-                response = Message.from_json(response_data)
-                print(f"[CLIENT] Réponse reçue: #{response.sequence_num}")
-                
-                # Analyser la réponse pour détecter les attaques MITM
-                self.detector.analyze_message(response)
-                
-                time.sleep(0.5)
+            # Le message a sa réponse : libérer sa place dans la fenêtre d'envoi
+            await in_flight.get()
+            response = Message.from_bytes(response_data)
+            print(f"[CLIENT] Réponse reçue: #{response.sequence_num}")
             
-            client_socket.close()
-            self.detector.print_report()
-        
-        except Exception as e:
-            print(f"[CLIENT] Erreur: {e}")
-
+            # Analyser la réponse pour détecter les attaques MITM
+            self.detector.analyze_message(response)
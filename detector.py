@@ -4,36 +4,84 @@ Système de détection d'attaques Man-in-the-Middle (MITM)
 
 import hashlib
 import hmac
+import sys
 import time
-from typing import Dict, Set, Tuple
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
 from message import Message
 from utils import ThreatLevel, DetectionAlert
 
 
+# Drapeaux retournés par _classify
+_SEQUENCE_ANOMALY = 1
+_TIMING_ANOMALY = 2
+
+
+def _classify(seq: int, ts_ns: int, now_ns: int, expected_seq: int, max_delta_ns: int) -> int:
+    """
+    Partie purement arithmétique des détections de séquence et de délai
+    
+    Retourne un masque de drapeaux ; 0 pour un message conforme, ce qui
+    évite tout appel de méthode sur le chemin nominal.
+    """
+    flags = 0
+    if seq != expected_seq:
+        flags |= _SEQUENCE_ANOMALY
+    if now_ns - ts_ns > max_delta_ns:
+        flags |= _TIMING_ANOMALY
+    return flags
+
+
 class MITMDetector:
     """
     Système de détection d'attaques MITM
     Analyse les incohérences et anomalies dans les échanges TCP
     """
     
-    def __init__(self, connection_id: str, shared_secret: str = "secure_key"):
+    def __init__(self, connection_id: str, shared_secret: str = "secure_key", quiet: bool = False,
+                 replay_window: int = 20_000):
         """
         Initialise le détecteur MITM
         
         Args:
             connection_id: Identifiant unique de la connexion
             shared_secret: Clé secrète partagée pour HMAC
+            quiet: Désactive l'affichage des alertes au fil de l'eau (benchmarks)
+            replay_window: Nombre de messages récents mémorisés pour la détection de rejeu (>= 1)
         """
+        if replay_window < 1:
+            raise ValueError(f"replay_window doit être >= 1 (reçu {replay_window})")
+        
         self.connection_id = connection_id
         self.shared_secret = shared_secret
+        self.quiet = quiet
+        self._secret_bytes = shared_secret.encode()
+        
+        # État HMAC pré-initialisé avec la clé (ipad/opad absorbés une seule fois),
+        # copié pour chaque message au lieu de refaire le padding de clé
+        self._hmac_template = hmac.new(self._secret_bytes, None, hashlib.sha256)
         
         # Suivi des messages
         self.expected_sequence = 0
-        self.received_messages: Dict[int, Message] = {}
-        self.message_hashes: Set[str] = set()
+        
+        # Numéros de séquence déjà reçus : bitmap (1 bit par numéro) agrandie
+        # par doublement jusqu'à max_seq_bitmap bits ; les numéros hors de
+        # cette plage (négatifs ou très grands) vont dans un ensemble à part
+        self.max_seq_bitmap = 1 << 24  # 2 Mio au maximum
+        self._seen_seq = bytearray(128)
+        self._seen_seq_overflow: Set[int] = set()
+        
+        # Derniers messages analysés, conservés pour le contexte des alertes
+        self.recent_messages: Deque[Message] = deque(maxlen=100)
+        
+        # Détection de rejeu : fenêtre glissante exacte des empreintes HMAC
+        # brutes (32 octets) des replay_window derniers messages
+        self._replay_digests: Deque[bytes] = deque(maxlen=replay_window)
+        self._replay_set: Set[bytes] = set()
         
         # Détection d'anomalies
         self.alerts: list[DetectionAlert] = []
+        self._count_by_level: Dict[ThreatLevel, int] = {level: 0 for level in ThreatLevel}
         self.time_anomalies: Dict[int, float] = {}
         self.sequence_gaps: list[Tuple[int, int]] = []
         self.duplicate_count = 0
@@ -44,15 +92,56 @@ class MITMDetector:
         self.max_time_delta = 10.0  # Délai maximum accepté entre messages (secondes)
         self.time_anomaly_threshold = 0.1  # Anomalie si écart > 0.1s
         
-        print(f"[DÉTECTEUR MITM] Connexion {connection_id} initialisée")
+        # Journal des alertes, écrit sur stdout en un seul appel par vidage.
+        # Vidé après une analyse dès qu'il dépasse log_flush_threshold lignes
+        # (0 : après chaque message ayant levé des alertes)
+        self._log_buffer: list[str] = []
+        self.log_flush_threshold = 0
+        
+        if not quiet:
+            print(f"[DÉTECTEUR MITM] Connexion {connection_id} initialisée")
+    
+    @property
+    def replay_window(self) -> int:
+        """Taille de la fenêtre de rejeu (lecture seule, fixée à la construction)"""
+        return self._replay_digests.maxlen
+    
+    @property
+    def max_time_delta(self) -> float:
+        """Délai maximum accepté (secondes), conservé en nanosecondes entières"""
+        return self._max_time_delta_ns / 1e9
+    
+    @max_time_delta.setter
+    def max_time_delta(self, seconds: float):
+        self._max_time_delta_ns = int(seconds * 1_000_000_000)
+    
+    def _append_alert(self, alert: DetectionAlert):
+        """Enregistre une alerte et met à jour les compteurs par niveau"""
+        self.alerts.append(alert)
+        self._count_by_level[alert.threat_level] += 1
+        if not self.quiet:
+            self._log_buffer.append(f"⚠️  {alert}")
+    
+    def flush_log(self):
+        """Écrit les alertes en attente sur stdout"""
+        if self._log_buffer:
+            sys.stdout.write('\n'.join(self._log_buffer) + '\n')
+            self._log_buffer.clear()
     
-    def calculate_checksum(self, message_data: str) -> str:
+    def calculate_checksum(self, msg: Message) -> str:
         """Calcule un HMAC-SHA256 pour vérifier l'intégrité"""
-        return hmac.new(
-            self.shared_secret.encode(),
-            message_data.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        return self.calculate_checksum_bytes(msg).hex()
+    
+    def calculate_checksum_bytes(self, msg: Message) -> bytes:
+        """
+        Calcule le HMAC-SHA256 brut d'un message
+        
+        Cette empreinte unique sert à la fois à la vérification d'intégrité
+        et de clé pour la détection de rejeu.
+        """
+        h = self._hmac_template.copy()
+        h.update(msg.canonical())
+        return h.digest()
     
     def create_message(self, content: str) -> Message:
         """Crée un message avec numéro de séquence et checksum"""
@@ -62,71 +151,110 @@ class MITMDetector:
             content=content,
             checksum=""
         )
-        msg.checksum = self.calculate_checksum(f"{msg.sequence_num}{msg.timestamp}{content}")
+        msg.checksum = self.calculate_checksum(msg)
         self.expected_sequence += 1
         return msg
     
-    def detect_message_modification(self, msg: Message) -> bool:
+    def detect_message_modification(self, msg: Message, digest: Optional[bytes] = None) -> bool:
         """
         Détecte si un message a été modifié
         
+        Args:
+            msg: Message à vérifier
+            digest: HMAC déjà calculé (calculate_checksum_bytes), recalculé si absent
+        
         Returns:
             True si modification détectée
         """
-        expected_checksum = self.calculate_checksum(
-            f"{msg.sequence_num}{msg.timestamp}{msg.content}"
-        )
+        if digest is None:
+            digest = self.calculate_checksum_bytes(msg)
+        
+        # Comparaison en temps constant de la forme hexadécimale exacte
+        # (minuscules, sans séparateur)
+        try:
+            received = msg.checksum.encode('ascii')
+        except (AttributeError, UnicodeEncodeError):
+            received = b""
         
-        if msg.checksum != expected_checksum:
+        if not hmac.compare_digest(received, digest.hex().encode()):
             alert = DetectionAlert(
                 threat_level=ThreatLevel.HIGH,
                 alert_type="MESSAGE MODIFIÉ",
                 description=f"Message #{msg.sequence_num} altéré - Checksum invalide",
                 timestamp=time.time()
             )
-            self.alerts.append(alert)
+            self._append_alert(alert)
             self.modified_count += 1
-            print(f"⚠️  {alert}")
             return True
         
         return False
     
-    def detect_replay_attack(self, msg: Message) -> bool:
+    def detect_replay_attack(self, msg: Message, digest: Optional[bytes] = None) -> bool:
         """
         Détecte les attaques par rejeu (replay)
         
+        Args:
+            msg: Message à vérifier
+            digest: HMAC déjà calculé (calculate_checksum_bytes), recalculé si absent
+        
         Returns:
             True si rejeu/duplication détecté
         """
-        msg_hash = hashlib.sha256(
-            f"{msg.sequence_num}{msg.timestamp}{msg.content}".encode()
-        ).hexdigest()
+        if digest is None:
+            digest = self.calculate_checksum_bytes(msg)
         
-        if msg_hash in self.message_hashes:
+        if digest in self._replay_set:
             alert = DetectionAlert(
                 threat_level=ThreatLevel.CRITICAL,
                 alert_type="REJEU DE MESSAGE (REPLAY)",
                 description=f"Message #{msg.sequence_num} dupliqué détecté",
                 timestamp=time.time()
             )
-            self.alerts.append(alert)
+            self._append_alert(alert)
             self.replay_count += 1
-            print(f"⚠️  {alert}")
             return True
         
-        self.message_hashes.add(msg_hash)
+        window = self._replay_digests
+        if window and len(window) == window.maxlen:
+            self._replay_set.discard(window[0])
+        window.append(digest)
+        self._replay_set.add(digest)
         return False
     
+    def _seq_seen(self, seq: int) -> bool:
+        """Indique si le numéro de séquence a déjà été reçu"""
+        index = seq >> 3
+        if 0 <= seq and index < len(self._seen_seq):
+            return bool(self._seen_seq[index] & (1 << (seq & 7)))
+        return seq in self._seen_seq_overflow
+    
+    def _seq_mark(self, seq: int):
+        """Marque le numéro de séquence comme reçu"""
+        if not 0 <= seq < self.max_seq_bitmap:
+            self._seen_seq_overflow.add(seq)
+            return
+        
+        index = seq >> 3
+        if index >= len(self._seen_seq):
+            size = len(self._seen_seq)
+            while size <= index:
+                size *= 2
+            self._seen_seq.extend(bytes(size - len(self._seen_seq)))
+        self._seen_seq[index] |= 1 << (seq & 7)
+    
     def detect_sequence_anomaly(self, msg: Message) -> bool:
         """
         Détecte les incohérences dans l'ordre des messages
         
+        Ne fait pas avancer expected_sequence : analyze_message l'incrémente
+        lui-même pour un message reçu dans l'ordre.
+        
         Returns:
             True si anomalie de séquence détectée
         """
         # Vérifier si le numéro de séquence correspond
         if msg.sequence_num != self.expected_sequence:
-            if msg.sequence_num in self.received_messages:
+            if self._seq_seen(msg.sequence_num):
                 # Doublon exact
                 self.duplicate_count += 1
                 alert = DetectionAlert(
@@ -154,11 +282,9 @@ class MITMDetector:
                     timestamp=time.time()
                 )
             
-            self.alerts.append(alert)
-            print(f"⚠️  {alert}")
+            self._append_alert(alert)
             return True
         
-        self.expected_sequence += 1
         return False
     
     def detect_timing_anomaly(self, msg: Message) -> bool:
@@ -168,20 +294,20 @@ class MITMDetector:
         Returns:
             True si anomalie temporelle détectée
         """
-        current_time = time.time()
-        time_diff = current_time - msg.timestamp
+        now_ns = time.time_ns()
+        diff_ns = now_ns - msg.timestamp_ns
         
         # Vérifier si le timestamp du message est trop ancien
-        if time_diff > self.max_time_delta:
+        if diff_ns > self._max_time_delta_ns:
+            time_diff = diff_ns / 1e9
             alert = DetectionAlert(
                 threat_level=ThreatLevel.MEDIUM,
                 alert_type="TIMESTAMP SUSPECT",
                 description=f"Message #{msg.sequence_num} avec délai de {time_diff:.2f}s",
-                timestamp=current_time
+                timestamp=now_ns / 1e9
             )
-            self.alerts.append(alert)
+            self._append_alert(alert)
             self.time_anomalies[msg.sequence_num] = time_diff
-            print(f"⚠️  {alert}")
             return True
         
         return False
@@ -193,26 +319,57 @@ class MITMDetector:
         Returns:
             True si une menace est détectée
         """
+        threats_detected = self._analyze(msg, self.calculate_checksum_bytes(msg))
+        if len(self._log_buffer) > self.log_flush_threshold:
+            self.flush_log()
+        return threats_detected
+    
+    def analyze_batch(self, msgs: List[Message]) -> List[bool]:
+        """
+        Analyse un lot de messages tamponnés
+        
+        Les empreintes HMAC de tous les messages sont calculées en une seule
+        passe, puis les détections sont appliquées dans l'ordre.
+        
+        Returns:
+            Pour chaque message, True si une menace est détectée
+        """
+        digests = [self.calculate_checksum_bytes(msg) for msg in msgs]
+        results = [self._analyze(msg, digest) for msg, digest in zip(msgs, digests)]
+        if len(self._log_buffer) > self.log_flush_threshold:
+            self.flush_log()
+        return results
+    
+    def _analyze(self, msg: Message, digest: bytes) -> bool:
+        """Applique les quatre détections à un message, avec son HMAC déjà calculé"""
         threats_detected = False
         
         # 1. Vérifier l'intégrité du message
-        if self.detect_message_modification(msg):
+        if self.detect_message_modification(msg, digest):
             threats_detected = True
         
         # 2. Détecter les rejeux/doublons
-        if self.detect_replay_attack(msg):
+        if self.detect_replay_attack(msg, digest):
             threats_detected = True
         
-        # 3. Vérifier l'ordre des messages
-        if self.detect_sequence_anomaly(msg):
-            threats_detected = True
+        flags = _classify(msg.sequence_num, msg.timestamp_ns, time.time_ns(),
+                          self.expected_sequence, self._max_time_delta_ns)
+        
+        # 3. Vérifier l'ordre des messages (seul endroit où la séquence avance)
+        if flags & _SEQUENCE_ANOMALY:
+            if self.detect_sequence_anomaly(msg):
+                threats_detected = True
+        else:
+            self.expected_sequence += 1
         
         # 4. Analyser les anomalies temporelles
-        if self.detect_timing_anomaly(msg):
-            threats_detected = True
+        if flags & _TIMING_ANOMALY:
+            if self.detect_timing_anomaly(msg):
+                threats_detected = True
         
         # Enregistrer le message analysé
-        self.received_messages[msg.sequence_num] = msg
+        self._seq_mark(msg.sequence_num)
+        self.recent_messages.append(msg)
         
         return threats_detected
     
@@ -242,16 +399,17 @@ class MITMDetector:
         }
     
     def critical_threats(self) -> int:
-        return sum(1 for a in self.alerts if a.threat_level == ThreatLevel.CRITICAL)
+        return self._count_by_level[ThreatLevel.CRITICAL]
     
     def high_threats(self) -> int:
-        return sum(1 for a in self.alerts if a.threat_level == ThreatLevel.HIGH)
+        return self._count_by_level[ThreatLevel.HIGH]
     
     def medium_threats(self) -> int:
-        return sum(1 for a in self.alerts if a.threat_level == ThreatLevel.MEDIUM)
+        return self._count_by_level[ThreatLevel.MEDIUM]
     
     def print_report(self):
         """Affiche un rapport détaillé"""
+        self.flush_log()
         assessment = self.get_threat_assessment()
         print("\n" + "="*60)
         print("RAPPORT DE DÉTECTION MITM")
@@ -12,6 +12,15 @@ from detector import MITMDetector
 from simulation import simulate_mitm_attack
 
 
+def print_usage():
+    """Affiche les modes d'utilisation"""
+    print("\nModes d'utilisation:")
+    print("  python main.py server          - Démarre le serveur")
+    print("  python main.py client          - Démarre le client")
+    print("  python main.py client <pause>  - Client avec pause entre messages (s)")
+    print("  (pas d'argument)               - Lance la simulation d'attaques\n")
+
+
 def main():
     """Fonction principale"""
     print("\n" + "="*60)
@@ -22,14 +31,20 @@ def main():
         server = SecureServer()
         server.start()
     elif len(sys.argv) > 1 and sys.argv[1] == 'client':
-        client = SecureClient(num_messages=5)
+        # Pause optionnelle entre les messages: python main.py client 0.5
+        try:
+            send_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+            if not send_interval >= 0:
+                raise ValueError(sys.argv[2])
+        except ValueError:
+            print(f"\nPause invalide: {sys.argv[2]!r} (nombre de secondes positif attendu)")
+            print_usage()
+            return
+        client = SecureClient(num_messages=5, send_interval=send_interval)
         client.connect_and_communicate()
     else:
         # Mode simulation
-        print("\nModes d'utilisation:")
-        print("  python main.py server  - Démarre le serveur")
-        print("  python main.py client  - Démarre le client")
-        print("  (pas d'argument)       - Lance la simulation d'attaques\n")
+        print_usage()
         
         detector = MITMDetector("SIMULATION")
         simulate_mitm_attack(detector)
@@ -3,10 +3,23 @@ Structure de message sécurisé pour les communications TCP
 """
 
 import json
-from dataclasses import dataclass, asdict
+import struct
+from dataclasses import dataclass
 
 
-@dataclass
+# En-tête binaire de la forme canonique : séquence (int64) + timestamp (double)
+_CANONICAL_HEADER = struct.Struct('<qd')
+
+
+def _load_object(data) -> dict:
+    """Décode un objet JSON ; ValueError si le document n'est pas un objet"""
+    obj = json.loads(data)
+    if not isinstance(obj, dict):
+        raise ValueError(f"Objet JSON attendu, reçu {type(obj).__name__}")
+    return obj
+
+
+@dataclass(slots=True)
 class Message:
     """Représentation d'un message TCP sécurisé"""
     sequence_num: int
@@ -14,10 +27,63 @@ class Message:
     content: str
     checksum: str
     
+    @property
+    def timestamp_ns(self) -> int:
+        """Timestamp en nanosecondes entières, dérivé de timestamp (seule valeur signée)"""
+        if not isinstance(self.timestamp, (int, float)):
+            raise ValueError(f"Message #{self.sequence_num}: timestamp invalide")
+        try:
+            return int(self.timestamp * 1_000_000_000)
+        except (OverflowError, ValueError) as e:
+            raise ValueError(f"Message #{self.sequence_num}: timestamp invalide") from e
+    
+    def canonical(self) -> bytes:
+        """
+        Octets signés par le HMAC
+        
+        Séquence et timestamp sont encodés en binaire (taille fixe, sans
+        conversion en texte), suivis du contenu en UTF-8.
+        """
+        if not isinstance(self.content, str):
+            raise ValueError(f"Message #{self.sequence_num} non encodable: contenu non textuel")
+        try:
+            header = _CANONICAL_HEADER.pack(self.sequence_num, self.timestamp)
+        except struct.error as e:
+            raise ValueError(f"Message #{self.sequence_num} non encodable: {e}") from e
+        return header + self.content.encode()
+    
     def to_json(self) -> str:
-        return json.dumps(asdict(self))
+        return json.dumps({
+            'sequence_num': self.sequence_num,
+            'timestamp': self.timestamp,
+            'content': self.content,
+            'checksum': self.checksum
+        })
     
     @staticmethod
     def from_json(data: str) -> 'Message':
-        obj = json.loads(data)
-        return Message(**obj)
+        obj = _load_object(data)
+        return Message(
+            sequence_num=obj['sequence_num'],
+            timestamp=obj['timestamp'],
+            content=obj['content'],
+            checksum=obj['checksum']
+        )
+    
+    def to_bytes(self) -> bytes:
+        """Encodage compact pour le réseau (clés courtes, sans espaces)"""
+        return json.dumps(
+            {'s': self.sequence_num, 't': self.timestamp, 'c': self.content, 'k': self.checksum},
+            separators=(',', ':'),
+            ensure_ascii=False
+        ).encode()
+    
+    @staticmethod
+    def from_bytes(data: bytes) -> 'Message':
+        obj = _load_object(data)
+        return Message(
+            sequence_num=obj['s'],
+            timestamp=obj['t'],
+            content=obj['c'],
+            checksum=obj['k']
+        )
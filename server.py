@@ -2,11 +2,10 @@
 Serveur TCP sécurisé avec détection MITM
 """
 
-import socket
-import json
-from typing import Optional
+import asyncio
 from message import Message
 from detector import MITMDetector
+from utils import encode_frame, read_msg
 
 
 class SecureServer:
@@ -15,58 +14,74 @@ class SecureServer:
     def __init__(self, host: str = 'localhost', port: int = 5555):
         self.host = host
         self.port = port
-        self.detector: Optional[MITMDetector] = None
+        self.detectors: list[MITMDetector] = []  # Détecteurs des clients connectés
         self.running = False
     
     def start(self):
         """Démarre le serveur"""
-        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_socket.bind((self.host, self.port))
-        server_socket.listen(1)
-        
-        print(f"\n[SERVEUR] En écoute sur {self.host}:{self.port}")
-        print("[SERVEUR] En attente de connexion...\n")
-        
         try:
-            client_socket, client_addr = server_socket.accept()
-            print(f"[SERVEUR] Client connecté: {client_addr}")
-            
-            self.detector = MITMDetector(f"SERVER-{client_addr[0]}:{client_addr[1]}")
-            self.handle_client(client_socket)
-            
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             print("\n[SERVEUR] Arrêt")
         finally:
-            server_socket.close()
-            if self.detector:
-                self.detector.print_report()
+            self.running = False
+            for detector in self.detectors:
+                detector.print_report()
+    
+    async def serve(self):
+        """Accepte les clients en parallèle, chacun avec son propre détecteur"""
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.running = True
+        
+        print(f"\n[SERVEUR] En écoute sur {self.host}:{self.port}")
+        print("[SERVEUR] En attente de connexions...\n")
+        
+        async with server:
+            await server.serve_forever()
     
-    def handle_client(self, client_socket):
-        """Gère la communication avec le client"""
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Gère la communication avec un client"""
+        client_addr = writer.get_extra_info('peername')
+        print(f"[SERVEUR] Client connecté: {client_addr}")
+        
+        detector = MITMDetector(f"SERVER-{client_addr[0]}:{client_addr[1]}")
+        self.detectors.append(detector)
+        
+        # Numérotation des réponses, indépendante de la séquence attendue du client
+        # (le client envoie ses messages sans attendre chaque réponse)
+        sender = MITMDetector(f"SERVER-{client_addr[0]}:{client_addr[1]}-ENVOI", quiet=True)
+        
         try:
             while True:
-                # Recevoir un message du client
-                data = client_socket.recv(1024).decode()
-                if not data:
+                # Recevoir un message du client (trame préfixée par sa longueur)
+                data = await read_msg(reader)
+                if data is None:
                     break
                 
                 try:
-                    msg = Message.from_json(data)
+                    msg = Message.from_bytes(data)
                     print(f"[SERVEUR] Message reçu: #{msg.sequence_num}")
                     
                     # Analyser pour détecter les attaques MITM
-                    self.detector.analyze_message(msg)
+                    detector.analyze_message(msg)
                     
                     # Envoyer une réponse
-                    response = self.detector.create_message(f"ACK-{msg.sequence_num}")
-                    client_socket.send(response.to_json().encode())
-                    
-                except json.JSONDecodeError:
+                    response = sender.create_message(f"ACK-{msg.sequence_num}")
+                    writer.write(encode_frame(response.to_bytes()))
+                    await writer.drain()
+                
+                except (ValueError, KeyError):
                     print("[SERVEUR] Erreur décodage message")
         
         except Exception as e:
             print(f"[SERVEUR] Erreur: {e}")
         finally:
-            client_socket.close()
-
+            # Rapport à la déconnexion, puis libération du détecteur
+            print(f"[SERVEUR] Client déconnecté: {client_addr}")
+            self.detectors.remove(detector)
+            detector.print_report()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
@@ -3,10 +3,19 @@ Utilitaires et énumérations pour le système de détection MITM
 """
 
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
+import asyncio
+import struct
 import time
 
 
+# Trame réseau : en-tête (version du protocole, longueur du contenu) + contenu
+PROTOCOL_VERSION = 4
+FRAME_HEADER = struct.Struct("!BI")
+MAX_FRAME_SIZE = 1 << 20  # 1 Mio
+
+
 class ThreatLevel(Enum):
     """Niveaux de menace détectés"""
     NONE = "AUCUNE"
@@ -16,14 +25,55 @@ class ThreatLevel(Enum):
     CRITICAL = "CRITIQUE"
 
 
-@dataclass
+@dataclass(slots=True)
 class DetectionAlert:
     """Alerte de sécurité détectée"""
     threat_level: ThreatLevel
     alert_type: str
     description: str
     timestamp: float
+    _ctime: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Date formatée une seule fois (l'alerte est affichée puis reprise dans le rapport)
+        self._ctime = time.ctime(self.timestamp)
     
     def __str__(self) -> str:
         return (f"[{self.threat_level.value}] {self.alert_type}: {self.description} "
-                f"({time.ctime(self.timestamp)})")
+                f"({self._ctime})")
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """Préfixe le contenu par l'en-tête de trame"""
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, len(payload)) + payload
+
+
+def _frame_length(header: bytes) -> int:
+    """Valide un en-tête de trame et retourne la longueur du contenu"""
+    version, length = FRAME_HEADER.unpack(header)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Version de protocole inattendue: {version}")
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Trame trop grande: {length} octets")
+    return length
+
+
+async def read_msg(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """
+    Lit une trame complète depuis un flux asyncio
+    
+    Returns:
+        Le contenu de la trame, ou None si la connexion est fermée
+    """
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ConnectionError("Connexion fermée au milieu d'une trame") from e
+    
+    length = _frame_length(header)
+    try:
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise ConnectionError("Connexion fermée au milieu d'une trame") from e